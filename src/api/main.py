@@ -1,19 +1,26 @@
 """FastAPI application entrypoint."""
 from __future__ import annotations
 
+import csv
+import hashlib
 import io
 import logging
-import uuid
+import secrets
+import zipfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any
 
-import pandas as pd
-from docx import Document
-from fastapi import FastAPI, File, HTTPException, Request, UploadFile, status
+import anyio.to_thread
+import pyarrow as pa
+import pyarrow.csv as pv
+from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from lxml import etree
+from pydantic import BaseModel, ValidationError
 
 from src.pmo_agent import session_store
 from src.pmo_agent.llm_client import chat_complete
@@ -22,16 +29,50 @@ from src.pmo_agent.prompts import get_system_prompt
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
 
-app = FastAPI(title="Task Management PMO Agent")
+# Worker threads available for CPU-bound upload parsing and sync endpoints.
+_THREADPOOL_SIZE = 40
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Size the shared threadpool so concurrent uploads do not queue behind each other."""
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = _THREADPOOL_SIZE
+    yield
+
+
+app = FastAPI(title="Task Management PMO Agent", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 logger = logging.getLogger(__name__)
 
 MAX_FILE_SIZE = 1 * 1024 * 1024  # 1 MB
-ALLOWED_EXTENSIONS = {"txt", "md", "csv", "docx"}
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+_UPLOAD_PATH = "/upload"
+# Headroom for multipart boundaries and part headers around the file itself.
+_MULTIPART_OVERHEAD = 16 * 1024
+ALLOWED_EXTENSIONS = frozenset({"txt", "md", "csv", "docx"})
 SESSION_COOKIE_NAME = "chat_session_id"
-_CONTEXT_SNIPPET = 2_000
+_SESSIONLESS_PATH_PREFIX = "/static/"
+_SESSIONLESS_PATHS = frozenset({"/"})
 _TEXT_PREVIEW_LIMIT = 500
+_CSV_PREVIEW_ROWS = 50
+_CSV_BLOCK_SIZE = 64 * 1024
+# Private: the first response also sets the session cookie, which shared caches must not replay.
+_HTML_CACHE_CONTROL = "private, max-age=300"
+
+_DOCX_NAMESPACES = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+_DOCX_BODY_PARAGRAPHS = etree.XPath("/w:document/w:body/w:p", namespaces=_DOCX_NAMESPACES)
+# Run content in document order; tabs and breaks are rendered as python-docx does.
+_DOCX_RUN_CONTENT = etree.XPath(
+    ".//w:r/*[self::w:t or self::w:tab or self::w:br or self::w:cr]", namespaces=_DOCX_NAMESPACES
+)
+_DOCX_W = f"{{{_DOCX_NAMESPACES['w']}}}"
+_DOCX_RUN_SEPARATORS = {f"{_DOCX_W}tab": "\t", f"{_DOCX_W}br": "\n", f"{_DOCX_W}cr": "\n"}
+
+# Static pages are loaded once at import so page hits skip the stat/open round trip.
+_WORKSPACE_HTML = (STATIC_DIR / "workspace.html").read_bytes()
+_WORKSPACE_ETAG = f'"{hashlib.md5(_WORKSPACE_HTML, usedforsecurity=False).hexdigest()}"'
 
 
 def _json_error(status_code: int, message: str) -> JSONResponse:
@@ -60,6 +101,30 @@ class ChatSendRequest(BaseModel):
     message: str
 
 
+class ChatSendResponse(BaseModel):
+    """Schema for chat replies."""
+
+    reply: str
+    used_context: bool
+
+
+class CsvPreview(BaseModel):
+    """First rows of an uploaded CSV file."""
+
+    columns: list[str]
+    rows: list[list[str]]
+
+
+class UploadResponse(BaseModel):
+    """Schema for a successful upload; exactly one preview field is set."""
+
+    ok: bool
+    chars: int
+    has_context: bool
+    csv_preview: CsvPreview | None = None
+    text_preview: str | None = None
+
+
 class MemoryAddRequest(BaseModel):
     """Schema for adding free-form notes to memory."""
 
@@ -67,6 +132,15 @@ class MemoryAddRequest(BaseModel):
     content: str
 
 
+async def _parse_chat_payload(request: Request) -> ChatSendRequest:
+    """Validate the raw chat body in a single pydantic-core JSON pass."""
+
+    try:
+        return ChatSendRequest.model_validate_json(await request.body())
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+
+
 @app.get("/")
 def read_root() -> dict[str, str]:
     """Basic health endpoint."""
@@ -74,22 +148,43 @@ def read_root() -> dict[str, str]:
     return {"status": "ok"}
 
 
+def _cached_html(request: Request, body: bytes, etag: str) -> Response:
+    """Return in-memory HTML, answering conditional requests with 304."""
+
+    headers = {"ETag": etag, "Cache-Control": _HTML_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    # If-None-Match uses weak comparison, so W/"..." matches the same tag.
+    if if_none_match and (
+        if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="text/html", headers=headers)
+
+
 @app.get("/workspace")
-def get_workspace_page() -> FileResponse:
+def get_workspace_page(request: Request) -> Response:
     """Serve the combined upload/chat workspace UI."""
 
-    return FileResponse(STATIC_DIR / "workspace.html")
+    return _cached_html(request, _WORKSPACE_HTML, _WORKSPACE_ETAG)
+
+
+def _new_session_id() -> str:
+    return secrets.token_urlsafe(16)
 
 
 @app.middleware("http")
 async def ensure_session_cookie(request: Request, call_next):
     """Ensure every request has a stable chat session identifier."""
 
+    path = request.url.path
+    if path in _SESSIONLESS_PATHS or path.startswith(_SESSIONLESS_PATH_PREFIX):
+        return await call_next(request)
+
     session_id = request.cookies.get(SESSION_COOKIE_NAME)
     new_session = False
 
     if not session_id:
-        session_id = str(uuid.uuid4())
+        session_id = _new_session_id()
         new_session = True
         logger.debug("Generated new chat session id %s", session_id)
 
@@ -109,64 +204,129 @@ async def ensure_session_cookie(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def reject_oversize_uploads(request: Request, call_next):
+    """Reject uploads whose declared size is over the limit before the form is spooled."""
+
+    if request.url.path == _UPLOAD_PATH:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + _MULTIPART_OVERHEAD:
+            return _json_error(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, _too_large_message(MAX_FILE_SIZE))
+
+    return await call_next(request)
+
+
 def _get_session_id(request: Request) -> str:
     session_id = getattr(request.state, "chat_session_id", None)
     if not session_id:
-        session_id = request.cookies.get(SESSION_COOKIE_NAME) or str(uuid.uuid4())
+        session_id = request.cookies.get(SESSION_COOKIE_NAME) or _new_session_id()
         request.state.chat_session_id = session_id
     return session_id
 
 
 def _get_extension(filename: str) -> str:
-    return Path(filename).suffix.lower().lstrip(".")
+    stem, _, extension = filename.rpartition(".")
+    return extension.lower() if stem else ""
 
 
-async def _read_file(file: UploadFile) -> bytes:
-    data = await file.read()
-    logger.debug("Read %s bytes from uploaded file %s", len(data), file.filename)
-    return data
+def _too_large_message(limit: int) -> str:
+    return f"File too large. Limit is {limit / (1024 * 1024):g} MB."
 
 
-def _handle_text_file(data: bytes) -> str:
+async def _read_bounded(file: UploadFile, limit: int) -> bytes:
+    """Copy the spooled upload into memory in fixed-size chunks, aborting once ``limit`` is exceeded."""
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(_UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=_too_large_message(limit),
+            )
+
+    logger.debug("Read %s bytes from uploaded file %s", len(buffer), file.filename)
+    return bytes(buffer)
+
+
+def _decode_utf8(data: bytes, detail: str) -> str:
     try:
         return data.decode("utf-8")
     except UnicodeDecodeError as exc:  # pragma: no cover - depends on user input
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unable to decode file as UTF-8.") from exc
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail) from exc
 
 
-def _handle_csv_file(data: bytes) -> tuple[str, dict[str, Any]]:
-    try:
-        text = data.decode("utf-8")
-    except UnicodeDecodeError as exc:  # pragma: no cover - depends on user input
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unable to decode CSV as UTF-8.") from exc
+def _csv_head(data: bytes, rows: int) -> bytes:
+    """Return the header line plus the first ``rows`` lines without copying the remainder."""
+
+    end = -1
+    for _ in range(rows + 1):
+        end = data.find(b"\n", end + 1)
+        if end == -1:
+            return data
+    return data[:end]
+
+
+def _handle_text_file(data: bytes) -> str:
+    return _decode_utf8(data, "Unable to decode file as UTF-8.")
+
+
+def _handle_csv_file(data: bytes) -> tuple[str, CsvPreview]:
+    # Type inference only sees the first block, so pin every column to string up front.
+    header = _decode_utf8(_csv_head(data, 0), "Unable to decode CSV as UTF-8.").removeprefix("\ufeff")
+    names = next(csv.reader([header]), [])
+    convert_options = pv.ConvertOptions(column_types=dict.fromkeys(names, pa.string()))
 
-    preview_df = None
     try:
-        df = pd.read_csv(io.StringIO(text))
-        preview_df = df.head(50)
-    except Exception as exc:  # pragma: no cover - depends on pandas parsing
+        reader = pv.open_csv(
+            pa.BufferReader(data),
+            read_options=pv.ReadOptions(block_size=_CSV_BLOCK_SIZE),
+            convert_options=convert_options,
+        )
+        batches = []
+        parsed_rows = 0
+        for batch in reader:  # Stop tokenising once the preview rows are available
+            batches.append(batch)
+            parsed_rows += batch.num_rows
+            if parsed_rows >= _CSV_PREVIEW_ROWS:
+                break
+        preview = pa.Table.from_batches(batches, schema=reader.schema).slice(0, _CSV_PREVIEW_ROWS)
+    except Exception as exc:  # pragma: no cover - depends on pyarrow parsing
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to parse CSV file.") from exc
 
-    csv_preview = {
-        "columns": preview_df.columns.tolist(),
-        "rows": preview_df.astype(str).values.tolist(),
-    }
-    summary_csv = preview_df.to_csv(index=False)
+    csv_preview = CsvPreview(
+        columns=preview.column_names,
+        rows=[list(row) for row in zip(*(column.to_pylist() for column in preview.columns))],
+    )
+    # Header plus preview rows, taken verbatim from the upload rather than re-serialised.
+    summary_csv = _decode_utf8(_csv_head(data, _CSV_PREVIEW_ROWS), "Unable to decode CSV as UTF-8.")
     return summary_csv, csv_preview
 
 
+def _docx_paragraph_text(paragraph: etree._Element) -> str:
+    return "".join(
+        _DOCX_RUN_SEPARATORS.get(node.tag, node.text or "") for node in _DOCX_RUN_CONTENT(paragraph)
+    )
+
+
 def _handle_docx_file(data: bytes) -> str:
     try:
-        document = Document(io.BytesIO(data))
-    except Exception as exc:  # pragma: no cover - depends on python-docx internals
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            document_xml = archive.read("word/document.xml")
+        # Untrusted input: never expand entities or fetch external resources.
+        parser = etree.XMLParser(resolve_entities=False, no_network=True)
+        root = etree.fromstring(document_xml, parser=parser)
+    except Exception as exc:  # pragma: no cover - depends on user input
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to read DOCX file.") from exc
 
-    paragraphs = [para.text.strip() for para in document.paragraphs if para.text.strip()]
-    return "\n".join(paragraphs)
+    return "\n".join(text for para in _DOCX_BODY_PARAGRAPHS(root) if (text := _docx_paragraph_text(para).strip()))
 
 
-@app.post("/upload")
-async def upload_file(request: Request, file: UploadFile = File(...)) -> JSONResponse:
+@app.post("/upload", response_model=UploadResponse, response_model_exclude_none=True)
+async def upload_file(request: Request, file: UploadFile = File(...)) -> UploadResponse | JSONResponse:
     """Accept a single file upload, extract text, and store it for the session."""
 
     if not file.filename:
@@ -176,45 +336,46 @@ async def upload_file(request: Request, file: UploadFile = File(...)) -> JSONRes
     if extension not in ALLOWED_EXTENSIONS:
         return _json_error(status.HTTP_400_BAD_REQUEST, "Unsupported file type. Allowed: txt, md, csv, docx.")
 
-    data = await _read_file(file)
-
-    if len(data) > MAX_FILE_SIZE:
-        return _json_error(status.HTTP_400_BAD_REQUEST, "File too large. Limit is 1 MB.")
+    data = await _read_bounded(file, MAX_FILE_SIZE)
     if not data:
         return _json_error(status.HTTP_400_BAD_REQUEST, "Uploaded file is empty.")
 
     logger.info("Processing uploaded file %s", file.filename)
 
     text_content: str
-    csv_preview: dict[str, Any] | None = None
+    csv_preview: CsvPreview | None = None
 
     if extension in {"txt", "md"}:
         text_content = _handle_text_file(data)
     elif extension == "csv":
-        text_content, csv_preview = _handle_csv_file(data)
+        text_content, csv_preview = await run_in_threadpool(_handle_csv_file, data)
     else:  # docx
-        text_content = _handle_docx_file(data)
+        text_content = await run_in_threadpool(_handle_docx_file, data)
 
     session_id = _get_session_id(request)
     session_store.set_context(session_id, text_content)
 
-    response_payload: dict[str, Any] = {
-        "ok": True,
-        "chars": len(text_content),
-        "has_context": True,
-    }
-
+    response = UploadResponse(ok=True, chars=len(text_content), has_context=True)
     if csv_preview is not None:
-        response_payload["csv_preview"] = csv_preview
+        response.csv_preview = csv_preview
     else:
-        response_payload["text_preview"] = text_content[:_TEXT_PREVIEW_LIMIT]
+        response.text_preview = text_content[:_TEXT_PREVIEW_LIMIT]
 
     logger.info("Stored uploaded file %s for session %s", file.filename, session_id)
-    return JSONResponse(status_code=status.HTTP_200_OK, content=response_payload)
+    return response
 
 
-@app.post("/chat/send")
-async def chat_send(payload: ChatSendRequest, request: Request) -> JSONResponse:
+@app.post(
+    "/chat/send",
+    response_model=ChatSendResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": ChatSendRequest.model_json_schema()}},
+        }
+    },
+)
+async def chat_send(request: Request, payload: ChatSendRequest = Depends(_parse_chat_payload)) -> ChatSendResponse | JSONResponse:
     """Send a chat message to Gemini using session-scoped context."""
 
     message = (payload.message or "").strip()
@@ -223,21 +384,20 @@ async def chat_send(payload: ChatSendRequest, request: Request) -> JSONResponse:
 
     session_id = _get_session_id(request)
     history = session_store.get_history(session_id)
-    context = session_store.get_context(session_id)
-
-    system_prompt = get_system_prompt()
-    used_context = False
-    if context:
-        context_snippet = context[:_CONTEXT_SNIPPET]
-        system_prompt = (
-            f"{system_prompt}\n\nContext from latest uploaded file (may be truncated):\n{context_snippet}"
-        )
-        used_context = True
+    context_snippet = session_store.get_context_snippet(session_id)
+
+    base_prompt = get_system_prompt()
+    used_context = bool(context_snippet)
+    system_prompt = (
+        f"{base_prompt}\n\nContext from latest uploaded file (may be truncated):\n{context_snippet}"
+        if context_snippet
+        else base_prompt
+    )
 
     messages = history + [{"role": "user", "content": message}]
 
     try:
-        reply = chat_complete(system_prompt, messages)
+        reply = await chat_complete(system_prompt, messages)
     except ValueError as exc:
         logger.error("Invalid chat payload", exc_info=exc)
         return _json_error(status.HTTP_400_BAD_REQUEST, str(exc))
@@ -252,4 +412,4 @@ async def chat_send(payload: ChatSendRequest, request: Request) -> JSONResponse:
     session_store.append_assistant(session_id, reply)
 
     logger.info("Chat message processed for session %s (used_context=%s)", session_id, used_context)
-    return JSONResponse(status_code=status.HTTP_200_OK, content={"reply": reply, "used_context": used_context})
+    return ChatSendResponse(reply=reply, used_context=used_context)
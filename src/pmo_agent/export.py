@@ -1,13 +1,14 @@
 """Export utilities for the PMO agent."""
 
+import csv
 from pathlib import Path
 from typing import Iterable
 
-import pandas as pd
-
 from .schemas import Task
 
 
 def export_tasks_to_csv(tasks: Iterable[Task], path: Path) -> None:
-    df = pd.DataFrame([task.model_dump() for task in tasks])
-    df.to_csv(path, index=False)
+    with Path(path).open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(Task.model_fields))
+        writer.writeheader()
+        writer.writerows(task.model_dump() for task in tasks)
@@ -1,12 +1,17 @@
 """Data ingestion utilities for the PMO agent."""
 
+import csv
 from pathlib import Path
 from typing import Iterable
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
 
 from .schemas import ProjectPlan, Task
 
+_ARROW_INGEST_THRESHOLD = 10 * 1024 * 1024  # 10 MB
+_ARROW_BLOCK_SIZE = 1 << 20
+
 
 class CSVIngestor:
     """Load project plans from CSV files."""
@@ -15,9 +20,34 @@ class CSVIngestor:
         self.path = Path(path)
 
     def read_tasks(self) -> Iterable[Task]:
-        df = pd.read_csv(self.path)
-        for row in df.to_dict(orient="records"):
-            yield Task(**row)
+        if self.path.stat().st_size > _ARROW_INGEST_THRESHOLD:
+            yield from self._read_tasks_batched()
+            return
+
+        with self.path.open(newline="", encoding="utf-8") as handle:
+            for row in csv.DictReader(handle):
+                # Empty cells mean "not set", matching the optional task fields.
+                yield Task.model_validate({key: value or None for key, value in row.items()})
+
+    def _read_tasks_batched(self) -> Iterable[Task]:
+        """Stream large files through Arrow one record batch at a time."""
+
+        fields = list(Task.model_fields)
+        reader = pv.open_csv(
+            str(self.path),
+            read_options=pv.ReadOptions(block_size=_ARROW_BLOCK_SIZE),
+            convert_options=pv.ConvertOptions(
+                # Read task columns as strings so pydantic does the typing, as on the small-file path.
+                column_types={name: pa.string() for name in fields},
+                strings_can_be_null=True,
+                null_values=[""],  # Only empty cells; "NA", "null" etc. stay literal as in csv.DictReader
+                include_columns=fields,
+                include_missing_columns=True,
+            ),
+        )
+        for batch in reader:
+            for row in batch.to_pylist():
+                yield Task.model_validate(row)
 
     def read_project_plan(self, name: str, description: str | None = None) -> ProjectPlan:
         return ProjectPlan(name=name, description=description, tasks=list(self.read_tasks()))
@@ -0,0 +1,104 @@
+"""Semantic response cache for near-duplicate LLM prompts."""
+from __future__ import annotations
+
+import logging
+from threading import Lock
+from typing import Callable, Hashable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_QUANT_SCALE = 127  # unit-norm components map onto the full int8 range
+
+
+class SemanticCache:
+    """Bounded LRU cache that matches prompts by cosine similarity.
+
+    Embeddings are stored quantized to int8, a quarter of the float32 footprint,
+    and scored with integer dot products.
+
+    ``embed`` must be a sentence-embedding model returning L2-normalized vectors of
+    length ``dim``. Lexical embeddings (bags of words) are not good enough: prompts
+    that differ only in an entity or a negation score as near-duplicates.
+
+    Entries carry a ``scope`` (e.g. the surrounding context) and only match
+    lookups made with the same scope, so a paraphrased question is never
+    answered from a response generated against different context.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], np.ndarray],
+        dim: int,
+        capacity: int = 1024,
+        threshold: float = 0.93,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1.")
+
+        self._quantized_threshold = threshold * _QUANT_SCALE * _QUANT_SCALE
+        self._embed = embed
+        self._embeddings = np.zeros((capacity, dim), dtype=np.int8)
+        self._scopes = np.zeros(capacity, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._responses: List[Optional[str]] = [None] * capacity
+        self._size = 0
+        self._clock = 0
+        self._lock = Lock()
+
+    def _quantize(self, text: str) -> np.ndarray:
+        return np.rint(self._embed(text) * _QUANT_SCALE).astype(np.int8)
+
+    def lookup(self, prompt: str, scope: Hashable = None) -> str | None:
+        """Return the cached response for the closest prompt in ``scope``, if similar enough."""
+
+        query = self._quantize(prompt)
+        scope_id = hash(scope)
+
+        with self._lock:
+            if not self._size:
+                return None
+
+            # Accumulate in int32: int8 products would overflow, and einsum casts in
+            # small buffers instead of materializing a widened copy of the matrix.
+            scores = np.einsum(
+                "ij,j->i", self._embeddings[: self._size], query, dtype=np.int32, casting="unsafe"
+            )
+            scores[self._scopes[: self._size] != scope_id] = -1
+            best = int(np.argmax(scores))
+            if scores[best] < self._quantized_threshold:
+                return None
+
+            self._clock += 1
+            self._last_used[best] = self._clock
+            logger.debug(
+                "Semantic cache hit (similarity=%.3f)", scores[best] / (_QUANT_SCALE * _QUANT_SCALE)
+            )
+            return self._responses[best]
+
+    def store(self, prompt: str, response: str, scope: Hashable = None) -> None:
+        """Insert a prompt/response pair, evicting the least recently used entry when full."""
+
+        embedding = self._quantize(prompt)
+        scope_id = hash(scope)
+
+        with self._lock:
+            if self._size < len(self._responses):
+                index = self._size
+                self._size += 1
+            else:
+                index = int(np.argmin(self._last_used))
+
+            self._clock += 1
+            self._embeddings[index] = embedding
+            self._scopes[index] = scope_id
+            self._last_used[index] = self._clock
+            self._responses[index] = response
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+
+        with self._lock:
+            self._size = 0
+            self._responses = [None] * len(self._responses)
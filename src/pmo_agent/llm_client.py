@@ -1,13 +1,20 @@
 """Utilities for interacting with the Google Gemini API."""
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import os
-from typing import List, Optional
-
-import google.generativeai as genai
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import TYPE_CHECKING, AsyncIterator, Deque, List, Optional, Sequence, Tuple
 
 from src.pmo_agent import memory
+from src.pmo_agent.llm_cache import SemanticCache
+
+if TYPE_CHECKING:  # The SDK is imported lazily in _get_model
+    import google.generativeai as genai
 
 logger = logging.getLogger(__name__)
 
@@ -15,33 +22,42 @@ _MODEL_NAME = "models/gemini-2.0-flash-lite"
 _API_KEY: Optional[str] = os.environ.get("GEMINI_API_KEY")
 _model: Optional[genai.GenerativeModel] = None
 _initialization_error: Optional[Exception] = None
-_MAX_PROMPT_CHARS = 20_000
+_model_lock = Lock()
+_MAX_PROMPT_CHARS = int(os.environ.get("MAX_PROMPT_CHARS", "20000"))
 
-if _API_KEY:
-    try:
-        genai.configure(api_key=_API_KEY)
-        _model = genai.GenerativeModel(model_name=_MODEL_NAME)
-    except Exception as exc:  # pragma: no cover - defensive logging
-        _initialization_error = exc
+_RESPONSE_CACHE_SIZE = 512
+_RESPONSE_CACHE_TTL_SECONDS = 600.0
+_response_cache: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+_response_cache_lock = Lock()
+# Off until a caller supplies a cache backed by a real sentence-embedding model.
+_semantic_cache: Optional[SemanticCache] = None
 
+_TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+_CHARS_PER_TOKEN = 4  # rough estimate used only for throttling
+_DEFAULT_BATCH_CONCURRENCY = 8
 
-def generate_response(prompt: str, session_id: str | None = None) -> str:
-    """Generate a text response from the Gemini model.
 
-    Args:
-        prompt: The user prompt to send to Gemini.
-
-    Returns:
-        The generated text response from Gemini.
+def _get_model() -> genai.GenerativeModel:
+    """Return the Gemini model, importing and configuring the SDK on first use.
 
     Raises:
-        ValueError: If ``prompt`` is empty.
         EnvironmentError: If the API key is missing.
-        RuntimeError: If the Gemini client fails to initialize or the request fails.
+        RuntimeError: If the Gemini client failed to initialize.
     """
 
-    if not prompt or not prompt.strip():
-        raise ValueError("Prompt must be a non-empty string.")
+    global _model, _initialization_error
+
+    if _model is None and _initialization_error is None and _API_KEY:
+        with _model_lock:
+            if _model is None and _initialization_error is None:
+                try:
+                    # Deferred: the SDK pulls in gRPC, protobuf and google-auth at import time.
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=_API_KEY)
+                    _model = genai.GenerativeModel(model_name=_MODEL_NAME)
+                except Exception as exc:  # pragma: no cover - defensive logging
+                    _initialization_error = exc
 
     if _initialization_error is not None:
         raise RuntimeError("Failed to initialize Gemini client") from _initialization_error
@@ -51,6 +67,115 @@ def generate_response(prompt: str, session_id: str | None = None) -> str:
             "GEMINI_API_KEY is not set. Please configure the environment variable before using the LLM."
         )
 
+    return _model
+
+
+def _cache_key(prompt: str) -> Tuple[str, str]:
+    # Collapse whitespace so trivially reformatted prompts share an entry.
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest(), _MODEL_NAME
+
+
+def _cache_get(key: Tuple[str, str]) -> str | None:
+    now = time.monotonic()
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            return None
+        text, stored_at = entry
+        if now - stored_at > _RESPONSE_CACHE_TTL_SECONDS:
+            del _response_cache[key]
+            return None
+        _response_cache.move_to_end(key)
+        return text
+
+
+def _cache_put(key: Tuple[str, str], text: str) -> None:
+    with _response_cache_lock:
+        _response_cache[key] = (text, time.monotonic())
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > _RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def cache_clear() -> None:
+    """Drop all cached Gemini responses, exact and semantic."""
+
+    with _response_cache_lock:
+        _response_cache.clear()
+    if _semantic_cache is not None:
+        _semantic_cache.clear()
+
+
+def set_semantic_cache(cache: SemanticCache | None) -> None:
+    """Enable near-duplicate response caching with ``cache``, or disable it with ``None``."""
+
+    global _semantic_cache
+    _semantic_cache = cache
+
+
+class _TokenBucket:
+    """Leaky-bucket throttle that keeps estimated usage under a tokens-per-minute quota."""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        self._capacity = float(tokens_per_minute)
+        self._refill_per_second = tokens_per_minute / 60.0
+        self._available = self._capacity
+        self._updated = time.monotonic()
+        # A thread lock, not asyncio.Lock: it is never held across an await, so the
+        # bucket can be shared by every event loop the client is driven from.
+        self._lock = Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Deduct ``tokens`` and return how long the caller must wait before using them."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self._capacity, self._available + (now - self._updated) * self._refill_per_second)
+            self._updated = now
+            # Going negative books the tokens ahead, so waiters are served in FIFO order.
+            self._available -= tokens
+            return max(0.0, -self._available / self._refill_per_second)
+
+    async def acquire(self, tokens: int) -> None:
+        delay = self._reserve(min(float(tokens), self._capacity))
+        if delay:
+            logger.debug("Throttling Gemini request for %.2fs to respect token quota", delay)
+            await asyncio.sleep(delay)
+
+
+_token_bucket = _TokenBucket(_TOKENS_PER_MINUTE)
+
+
+async def _generate(prompt: str) -> str:
+    """Send ``prompt`` to Gemini without blocking the event loop."""
+
+    await _token_bucket.acquire(len(prompt) // _CHARS_PER_TOKEN + 1)
+
+    try:
+        # The async client keeps a persistent channel, so connections are reused across calls.
+        response = await _get_model().generate_content_async(prompt)
+    except Exception as exc:  # pragma: no cover - actual API errors are external
+        raise RuntimeError("Gemini API request failed") from exc
+
+    text = getattr(response, "text", None)
+    if not text:
+        raise RuntimeError("Gemini API returned an empty response.")
+
+    return text
+
+
+def _build_prompt(prompt: str, session_id: str | None) -> str:
+    """Validate ``prompt`` and merge it with session and document memory."""
+
+    if not prompt or not prompt.strip():
+        raise ValueError("Prompt must be a non-empty string.")
+
+    if len(prompt) > _MAX_PROMPT_CHARS:
+        raise ValueError(f"Prompt exceeds {_MAX_PROMPT_CHARS} character limit.")
+
+    _get_model()
+
     doc_items = memory.get_context_items()
     final_prompt = memory.build_context_with_memory(
         session_id=session_id,
@@ -59,63 +184,162 @@ def generate_response(prompt: str, session_id: str | None = None) -> str:
         total_limit=_MAX_PROMPT_CHARS,
     )
     logger.debug("Final prompt length after memory merge: %s", len(final_prompt))
+    return final_prompt
+
+
+async def generate_response(prompt: str, session_id: str | None = None) -> str:
+    """Generate a text response from the Gemini model.
+
+    Args:
+        prompt: The user prompt to send to Gemini.
+
+    Returns:
+        The generated text response from Gemini.
+
+    Raises:
+        ValueError: If ``prompt`` is empty or longer than ``_MAX_PROMPT_CHARS``.
+        EnvironmentError: If the API key is missing.
+        RuntimeError: If the Gemini client fails to initialize or the request fails.
+    """
+
+    final_prompt = _build_prompt(prompt, session_id)
+
+    cache_key = _cache_key(final_prompt)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        logger.debug("Serving Gemini response from prompt cache")
+        return cached
+
+    semantic_cache = _semantic_cache
+    # Paraphrases only match when everything around the user's words (memory context) is identical.
+    context_scope = final_prompt.removesuffix(prompt)
+    if semantic_cache is not None:
+        # Embedding runs model inference, so keep it off the event loop.
+        cached = await asyncio.to_thread(semantic_cache.lookup, prompt, context_scope)
+        if cached is not None:
+            logger.debug("Serving Gemini response from semantic cache")
+            _cache_put(cache_key, cached)
+            return cached
+
+    text = await _generate(final_prompt)
+    _cache_put(cache_key, text)
+    if semantic_cache is not None:
+        await asyncio.to_thread(semantic_cache.store, prompt, text, context_scope)
+    return text
+
+
+class StreamAccumulator:
+    """Collect streamed text chunks, joining them only when the full text is read.
+
+    Appending to a list and joining once is linear in the total size, whereas
+    ``text += chunk`` re-copies the accumulated string on every chunk.
+    """
+
+    def __init__(self) -> None:
+        self._parts: List[str] = []
+        self._text: str | None = None
+
+    def append(self, chunk: str) -> None:
+        self._parts.append(chunk)
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self._parts)
+            self._parts = [self._text]  # Later joins start from the merged prefix
+        return self._text
+
+
+async def stream_response(prompt: str, session_id: str | None = None) -> AsyncIterator[str]:
+    """Stream a Gemini response chunk by chunk.
+
+    Use :class:`StreamAccumulator` when the complete text is also needed.
+
+    Raises:
+        ValueError: If ``prompt`` is empty or longer than ``_MAX_PROMPT_CHARS``.
+        EnvironmentError: If the API key is missing.
+        RuntimeError: If the Gemini client fails to initialize or the request fails.
+    """
+
+    final_prompt = _build_prompt(prompt, session_id)
+    await _token_bucket.acquire(len(final_prompt) // _CHARS_PER_TOKEN + 1)
 
     try:
-        response = _model.generate_content(final_prompt)
+        response = await _get_model().generate_content_async(final_prompt, stream=True)
+        async for chunk in response:
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
     except Exception as exc:  # pragma: no cover - actual API errors are external
         raise RuntimeError("Gemini API request failed") from exc
 
-    text = getattr(response, "text", None)
-    if not text:
-        raise RuntimeError("Gemini API returned an empty response.")
 
-    return text
+async def generate_responses(
+    prompts: Sequence[str],
+    max_concurrency: int = _DEFAULT_BATCH_CONCURRENCY,
+    session_id: str | None = None,
+) -> List[str]:
+    """Generate responses for several prompts concurrently.
+
+    Args:
+        prompts: The user prompts to send to Gemini.
+        max_concurrency: Maximum number of requests in flight at once.
+        session_id: Optional session whose chat history is merged into each prompt.
+
+    Returns:
+        The generated responses, in the same order as ``prompts``.
+
+    Raises:
+        ValueError: If ``max_concurrency`` is less than 1, or as for :func:`generate_response`.
+        EnvironmentError: If the API key is missing.
+        RuntimeError: If the Gemini client fails to initialize or a request fails.
+    """
+
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(prompt: str) -> str:
+        async with semaphore:
+            return await generate_response(prompt, session_id=session_id)
 
+    return list(await asyncio.gather(*(_run(prompt) for prompt in prompts)))
 
-def chat_complete(system_prompt: str, messages: List[dict]) -> str:
+
+async def chat_complete(system_prompt: str, messages: List[dict]) -> str:
     """Run a short chat completion with the Gemini model."""
 
     if not system_prompt or not system_prompt.strip():
         raise ValueError("System prompt must be provided.")
 
-    if _initialization_error is not None:
-        raise RuntimeError("Failed to initialize Gemini client") from _initialization_error
+    _get_model()
 
-    if _model is None:
-        raise EnvironmentError(
-            "GEMINI_API_KEY is not set. Please configure the environment variable before using the LLM."
-        )
+    system_line = f"System: {system_prompt.strip()}"
+    remaining = _MAX_PROMPT_CHARS - len(system_line)
 
-    sanitized_messages: List[dict] = []
-    for message in messages or []:
+    # Walk newest-first so only the tail that fits the budget is ever formatted.
+    lines: Deque[str] = deque()
+    for message in reversed(messages or []):
         role = message.get("role")
         content = (message.get("content") or "").strip()
         if role not in {"user", "assistant"} or not content:
             logger.debug("Skipping malformed message entry: %s", message)
             continue
-        sanitized_messages.append({"role": role, "content": content})
-
-    conversation_lines = [f"System: {system_prompt.strip()}"]
-    for entry in sanitized_messages:
-        prefix = "User" if entry["role"] == "user" else "Assistant"
-        conversation_lines.append(f"{prefix}: {entry['content']}")
-
-    conversation_text = "\n\n".join(conversation_lines)
-    if len(conversation_text) > _MAX_PROMPT_CHARS:
-        logger.debug("Chat prompt exceeds limit; trimming to %s characters", _MAX_PROMPT_CHARS)
-        conversation_text = (
-            conversation_lines[0]
-            + "\n\n"
-            + conversation_text[-(_MAX_PROMPT_CHARS - len(conversation_lines[0]) - 2):]
-        )
 
-    try:
-        response = _model.generate_content(conversation_text)
-    except Exception as exc:  # pragma: no cover - actual API errors are external
-        raise RuntimeError("Gemini API request failed") from exc
+        prefix = "User" if role == "user" else "Assistant"
+        line = f"{prefix}: {content}"
+        remaining -= len(line) + 2  # account for the blank-line separator
+        if remaining < 0:
+            logger.debug("Chat prompt exceeds limit; trimming to %s characters", _MAX_PROMPT_CHARS)
+            keep = len(line) + remaining
+            if keep > 0:
+                lines.appendleft(line[-keep:])
+            break
+        lines.appendleft(line)
 
-    text = getattr(response, "text", None)
-    if not text:
-        raise RuntimeError("Gemini API returned an empty response.")
+    lines.appendleft(system_line)
+    conversation_text = "\n\n".join(lines)
 
-    return text
+    return await _generate(conversation_text)
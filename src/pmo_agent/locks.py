@@ -0,0 +1,27 @@
+"""Striped locks for per-session state shared across request threads.
+
+Session stores guard each session's entries with one lock from a fixed
+table, so unrelated sessions rarely contend. Readers may check dict
+membership before taking the lock: that test is atomic under the GIL,
+and the lookup is repeated under the lock before the entry is used.
+"""
+from __future__ import annotations
+
+from threading import Lock
+from typing import Hashable
+
+
+class StripedLocks:
+    """Fixed table of locks selected by key hash."""
+
+    def __init__(self, stripes: int = 64) -> None:
+        if stripes < 1 or stripes & (stripes - 1):
+            raise ValueError("stripes must be a power of two.")
+
+        self._locks = tuple(Lock() for _ in range(stripes))
+        self._mask = stripes - 1  # power of two so the stripe index is a mask
+
+    def for_key(self, key: Hashable) -> Lock:
+        """Return the lock stripe guarding ``key``."""
+
+        return self._locks[hash(key) & self._mask]
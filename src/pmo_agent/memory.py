@@ -2,13 +2,33 @@
 from __future__ import annotations
 
 import logging
+import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from itertools import islice
 from threading import Lock
-from typing import Dict, Iterable, List, Sequence
+from types import MappingProxyType
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Mapping, Sequence, Tuple
+
+from .locks import StripedLocks
 
 logger = logging.getLogger(__name__)
 
+__all__ = [
+    "add_text",
+    "append_chat",
+    "build_context_with_memory",
+    "chat_length",
+    "count",
+    "format_ts",
+    "get_chat",
+    "get_context_items",
+    "list_items",
+    "reset",
+    "reset_chat",
+]
+
 
 _MAX_ITEMS = 20
 _MAX_CONTENT_LENGTH = 10_000
@@ -21,22 +41,30 @@ _CHAT_MESSAGE_CHAR_LIMIT = 4_000
 _DOC_CONTEXT_CHAR_LIMIT = 6_000
 _DOC_SNIPPET_LENGTH = 600
 _TOTAL_PROMPT_LIMIT = 20_000
+_PROMPT_CACHE_SIZE = 256
 
 
-@dataclass
+@dataclass(slots=True)
 class _MemoryItem:
     label: str
     content: str
+    preview: str = field(init=False)
 
-    @property
-    def preview(self) -> str:
-        """Return a short preview of the stored content."""
-        return (self.content[:_PREVIEW_LENGTH] + "…") if len(self.content) > _PREVIEW_LENGTH else self.content
+    def __post_init__(self) -> None:
+        # Content is never mutated after trimming, so the preview is computed once.
+        self.preview = (self.content[:_PREVIEW_LENGTH] + "\u2026") if len(self.content) > _PREVIEW_LENGTH else self.content
+
+
+@dataclass(slots=True)
+class _ChatMessage:
+    role: str
+    content: str
+    ts: int  # epoch milliseconds
 
 
 @dataclass
 class _MemoryStore:
-    _items: List[_MemoryItem] = field(default_factory=list)
+    _items: Deque[_MemoryItem] = field(default_factory=lambda: deque(maxlen=_MAX_ITEMS))
     _lock: Lock = field(default_factory=Lock)
 
     def add_text(self, label: str, content: str) -> None:
@@ -57,10 +85,9 @@ class _MemoryStore:
         item = _MemoryItem(label=label, content=trimmed_content)
 
         with self._lock:
-            self._items.insert(0, item)
-            if len(self._items) > _MAX_ITEMS:
-                dropped = self._items.pop()
-                logger.info("Memory capacity reached. Dropping oldest item with label %s", dropped.label)
+            if len(self._items) == self._items.maxlen:
+                logger.info("Memory capacity reached. Dropping oldest item with label %s", self._items[-1].label)
+            self._items.appendleft(item)  # Bounded deque evicts the oldest item from the tail
 
         logger.info("Added memory item with label %s (chars=%s)", label, len(trimmed_content))
 
@@ -71,33 +98,37 @@ class _MemoryStore:
             self._items.clear()
         logger.info("Memory reset. Removed %s items", count)
 
+    def count(self) -> int:
+        """Return the number of stored items without copying them."""
+        with self._lock:
+            return len(self._items)
+
     def list_items(self) -> List[Dict[str, str]]:
         """Return stored items with label and preview for UI/API responses."""
         with self._lock:
-            snapshot = list(self._items)
-
-        return [
-            {"label": item.label, "preview": item.preview}
-            for item in snapshot
-        ]
+            return [{"label": item.label, "preview": item.preview} for item in self._items]
 
-    def get_context_items(self) -> List[Dict[str, str]]:
-        """Return items for constructing LLM context (newest first)."""
+    def get_context_items(self) -> Tuple[Mapping[str, str], ...]:
+        """Return read-only items for constructing LLM context (newest first)."""
         with self._lock:
-            snapshot = list(self._items)
-        return [
-            {"label": item.label, "content": item.content}
-            for item in snapshot
-        ]
+            return tuple(MappingProxyType({"label": item.label, "content": item.content}) for item in self._items)
 
 
 memory_store = _MemoryStore()
-_chat_lock = Lock()
-_chat_history: Dict[str, List[Dict[str, str]]] = {}
+_chat_locks = StripedLocks()
+_chat_history: Dict[str, Deque[_ChatMessage]] = {}
+_chat_version: Dict[str, int] = {}  # bumped on every history change; keys the prompt cache
+_prompt_cache: "OrderedDict[Tuple[Hashable, ...], str]" = OrderedDict()
+_prompt_cache_lock = Lock()
 
 
-def _utc_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def format_ts(ms: int) -> str:
+    """Format an epoch-millisecond chat timestamp as an ISO 8601 UTC string."""
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).isoformat()
 
 
 def add_text(label: str, content: str) -> None:
@@ -110,12 +141,17 @@ def reset() -> None:
     memory_store.reset()
 
 
+def count() -> int:
+    """Convenience wrapper to count memory entries."""
+    return memory_store.count()
+
+
 def list_items() -> List[Dict[str, str]]:
     """Convenience wrapper to list memory entries."""
     return memory_store.list_items()
 
 
-def get_context_items() -> List[Dict[str, str]]:
+def get_context_items() -> Tuple[Mapping[str, str], ...]:
     """Convenience wrapper to retrieve context items for LLM usage."""
     return memory_store.get_context_items()
 
@@ -144,70 +180,82 @@ def append_chat(session_id: str, role: str, content: str) -> None:
         )
         trimmed = trimmed[:_CHAT_MESSAGE_CHAR_LIMIT]
 
-    entry = {"role": role, "content": trimmed, "ts": _utc_iso()}
+    entry = _ChatMessage(role=role, content=trimmed, ts=_now_ms())
 
-    with _chat_lock:
-        history = _chat_history.setdefault(session_id, [])
+    with _chat_locks.for_key(session_id):
+        try:
+            history = _chat_history[session_id]
+        except KeyError:  # Only allocate the deque for a session's first message
+            history = _chat_history[session_id] = deque(maxlen=_CHAT_STORAGE_LIMIT)
+        if len(history) == history.maxlen:
+            logger.info("Trimmed oldest chat message for session %s to enforce limits", session_id)
         history.append(entry)
-        if len(history) > _CHAT_STORAGE_LIMIT:
-            dropped = len(history) - _CHAT_STORAGE_LIMIT
-            del history[0:dropped]
-            logger.info(
-                "Trimmed %s oldest chat messages for session %s to enforce limits",
-                dropped,
-                session_id,
-            )
+        _chat_version[session_id] = _chat_version.get(session_id, 0) + 1
 
     logger.info("Stored chat message for session %s with role %s", session_id, role)
 
 
-def get_chat(session_id: str, limit_chars: int = _CHAT_MAX_CHARS, max_messages: int = _CHAT_MESSAGE_LIMIT) -> List[Dict[str, str]]:
-    """Return the most recent chat messages for a session within limits."""
+def get_chat(session_id: str, limit_chars: int = _CHAT_MAX_CHARS, max_messages: int = _CHAT_MESSAGE_LIMIT) -> List[Dict[str, Any]]:
+    """Return the most recent chat messages for a session within limits.
 
-    if not session_id:
+    ``ts`` is epoch milliseconds; use :func:`format_ts` when serializing it.
+    """
+
+    if not session_id or session_id not in _chat_history:
         return []
 
-    with _chat_lock:
-        history = list(_chat_history.get(session_id, []))
+    with _chat_locks.for_key(session_id):
+        # Copy only the newest ``max_messages`` references, walking from the right.
+        recent = list(islice(reversed(_chat_history.get(session_id, ())), max(max_messages, 0)))
 
-    if not history:
+    if not recent:
         return []
 
-    collected: List[Dict[str, str]] = []
+    collected: List[Dict[str, Any]] = []
     used_chars = 0
 
-    for message in reversed(history):  # Start from the newest
-        if len(collected) >= max_messages:
-            break
-
+    for message in recent:  # Newest first
         available = limit_chars - used_chars
         if available <= 0:
             break
 
-        content = message["content"]
-        if len(content) > available:
+        content = message.content
+        content_len = len(content)
+        if content_len > available:
             content = content[-available:]
+            content_len = available
 
         collected.append({
-            "role": message["role"],
+            "role": message.role,
             "content": content,
-            "ts": message["ts"],
+            "ts": message.ts,
         })
-        used_chars += len(content)
+        used_chars += content_len
 
     collected.reverse()
     return collected
 
 
+def chat_length(session_id: str) -> int:
+    """Return how many chat messages are stored for a session."""
+
+    if not session_id:
+        return 0
+
+    with _chat_locks.for_key(session_id):
+        return len(_chat_history.get(session_id, ()))
+
+
 def reset_chat(session_id: str) -> None:
     """Remove chat history for a session."""
 
     if not session_id:
         return
 
-    with _chat_lock:
+    with _chat_locks.for_key(session_id):
         existed = session_id in _chat_history
         _chat_history.pop(session_id, None)
+        _chat_version[session_id] = _chat_version.get(session_id, 0) + 1
 
     if existed:
         logger.info("Reset chat history for session %s", session_id)
@@ -217,62 +265,84 @@ def _build_chat_context(messages: Sequence[Dict[str, str]]) -> str:
     if not messages:
         return ""
 
-    lines = ["### CONTEXT: PRIOR CHAT"]
+    parts = ["### CONTEXT: PRIOR CHAT"]
     for message in reversed(messages):  # Latest first for readability
-        lines.append(f"- role: {message['role']} -> {message['content']}")
-    return "\n".join(lines)
+        parts.extend(("\n- role: ", message["role"], " -> ", message["content"]))
+    return "".join(parts)
 
 
-def _build_doc_context(doc_items: Iterable[Dict[str, str]], budget: int) -> str:
+def _build_doc_context(doc_items: Iterable[Mapping[str, str]], budget: int) -> str:
     header = "### CONTEXT: NOTES & DOCS"
     if budget <= len(header):
         return ""
 
-    lines = [header]
+    parts = [header]
     remaining = budget - len(header) - 1  # Reserve space for newline after the header
 
     for item in doc_items:
-        if remaining <= 0:
-            break
-
         label = item.get("label", "doc")
         content = item.get("content", "")
         if not content:
             continue
 
-        snippet_limit = min(_DOC_SNIPPET_LENGTH, remaining)
-        snippet = content[:snippet_limit]
-        line = f"{label}: {snippet}"
-        line_length = len(line)
-
-        if line_length > remaining:
-            available = remaining - len(label) - 2
-            if available <= 0:
-                break
-            snippet = snippet[:available]
-            if not snippet:
-                break
-            line = f"{label}: {snippet}"
-            line_length = len(line)
+        # Size the snippet so "label: snippet" fits the remaining budget on the first try.
+        label_len = len(label)
+        snippet_limit = min(_DOC_SNIPPET_LENGTH, remaining - label_len - 2)
+        if snippet_limit <= 0:
+            break
 
-        lines.append(line)
-        remaining -= line_length + 1  # account for newline
+        snippet = content[:snippet_limit]
+        parts.extend(("\n", label, ": ", snippet))
+        remaining -= label_len + len(snippet) + 3  # ": " plus the newline
 
-    return "\n".join(lines) if len(lines) > 1 else ""
+    return "".join(parts) if len(parts) > 1 else ""
 
 
 def build_context_with_memory(
     session_id: str | None,
     user_prompt: str,
-    doc_items: Sequence[Dict[str, str]] | None = None,
+    doc_items: Sequence[Mapping[str, str]] | None = None,
     total_limit: int = _TOTAL_PROMPT_LIMIT,
+    include_history: bool = True,
 ) -> str:
-    """Compose a prompt including chat history and document memory."""
+    """Compose a prompt including chat history and document memory.
+
+    Pass ``include_history=False`` to skip the chat history lookup entirely.
+    """
 
     if user_prompt is None:
         raise ValueError("User prompt must be provided.")
 
-    doc_items = list(doc_items or get_context_items())
+    doc_items = doc_items or get_context_items()  # Read-only snapshot; iterated, never copied
+
+    # Identical inputs (retries, fan-out) reuse the composed prompt. The doc key holds the
+    # strings themselves, so a hit compares them by identity rather than rehashing content.
+    history_version = _chat_version.get(session_id, 0) if session_id and include_history else 0
+    doc_key = tuple((item.get("label", "doc"), item.get("content", "")) for item in doc_items)
+    cache_key = (session_id, history_version, user_prompt, doc_key, total_limit, include_history)
+    with _prompt_cache_lock:
+        cached = _prompt_cache.get(cache_key)
+        if cached is not None:
+            _prompt_cache.move_to_end(cache_key)
+    if cached is not None:
+        logger.debug("Reusing composed prompt from cache")
+        return cached
+
+    final_prompt = _compose_prompt(session_id, user_prompt, doc_items, total_limit, include_history)
+    with _prompt_cache_lock:
+        _prompt_cache[cache_key] = final_prompt
+        if len(_prompt_cache) > _PROMPT_CACHE_SIZE:
+            _prompt_cache.popitem(last=False)
+    return final_prompt
+
+
+def _compose_prompt(
+    session_id: str | None,
+    user_prompt: str,
+    doc_items: Sequence[Mapping[str, str]],
+    total_limit: int,
+    include_history: bool,
+) -> str:
     prompt_section = f"### USER PROMPT\n{user_prompt}"
     divider = "---"
 
@@ -281,24 +351,27 @@ def build_context_with_memory(
         logger.debug("Prompt length exceeds total limit; returning prompt section only")
         return prompt_section
 
-    chat_char_budget = max(available_for_context - 64, 0)
+    chat_char_budget = max(available_for_context - 64, 0) if include_history else 0
     chat_messages = get_chat(session_id or "", limit_chars=min(_CHAT_MAX_CHARS, chat_char_budget)) if chat_char_budget > 0 else []
     chat_block = _build_chat_context(chat_messages)
-    context_sections: List[str] = []
+    chat_section = ""
+    doc_block = ""
 
     if chat_block:
-        chat_length = len(chat_block)
-        if chat_length <= available_for_context:
-            context_sections.append(chat_block)
-            available_for_context -= chat_length + 2
+        chat_block_len = len(chat_block)
+        if chat_block_len <= available_for_context:
+            chat_section = chat_block
+            available_for_context -= chat_block_len + 2
         else:
             logger.debug("Chat context exceeds budget even after trimming; dropping chat block")
 
     if available_for_context > 0 and doc_items:
         doc_budget = min(_DOC_CONTEXT_CHAR_LIMIT, available_for_context)
         doc_block = _build_doc_context(doc_items, doc_budget)
-        if doc_block:
-            context_sections.append(doc_block)
+
+    # Budget goes to chat first, but the output runs from most to least stable (docs, chat,
+    # user prompt) so consecutive requests share the longest possible prompt prefix.
+    context_sections = [section for section in (doc_block, chat_section) if section]
 
     if context_sections:
         context_text = "\n\n".join(context_sections)
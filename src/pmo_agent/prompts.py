@@ -1,6 +1,7 @@
 """Prompt utilities for the PMO agent."""
 from __future__ import annotations
 
+import functools
 import os
 
 DEFAULT_SYSTEM_PROMPT = (
@@ -10,10 +11,25 @@ DEFAULT_SYSTEM_PROMPT = (
 )
 
 
-def get_system_prompt() -> str:
-    """Return the configured system prompt, defaulting to the PMO persona."""
-
+@functools.cache
+def _resolve_system_prompt() -> str:
     override = os.environ.get("SYSTEM_PROMPT")
     if override and override.strip():
         return override.strip()
     return DEFAULT_SYSTEM_PROMPT
+
+
+def get_system_prompt() -> str:
+    """Return the configured system prompt, defaulting to the PMO persona.
+
+    The ``SYSTEM_PROMPT`` override is read once per process; call
+    :func:`reset_system_prompt_cache` after changing it at runtime.
+    """
+
+    return _resolve_system_prompt()
+
+
+def reset_system_prompt_cache() -> None:
+    """Forget the cached system prompt so the environment is read again."""
+
+    _resolve_system_prompt.cache_clear()
@@ -10,11 +10,16 @@ class RuleViolation(Exception):
 
 
 def ensure_unique_task_ids(plan: ProjectPlan) -> None:
+    ids = [task.id for task in plan.tasks]
+    if len(set(ids)) == len(ids):
+        return
+
+    # Slow path only once a duplicate is known to exist: report the first one.
     seen: set[str] = set()
-    for task in plan.tasks:
-        if task.id in seen:
-            raise RuleViolation(f"Duplicate task id detected: {task.id}")
-        seen.add(task.id)
+    for task_id in ids:
+        if task_id in seen:
+            raise RuleViolation(f"Duplicate task id detected: {task_id}")
+        seen.add(task_id)
 
 
 def validate_plan(plan: ProjectPlan, rules: Iterable) -> None:
@@ -22,5 +27,8 @@ def validate_plan(plan: ProjectPlan, rules: Iterable) -> None:
         rule(plan)
 
 
-def default_rules() -> list:
-    return [ensure_unique_task_ids]
+_DEFAULT_RULES = (ensure_unique_task_ids,)
+
+
+def default_rules() -> tuple:
+    return _DEFAULT_RULES
@@ -3,18 +3,29 @@ from __future__ import annotations
 
 import logging
 from collections import deque
-from threading import Lock
-from typing import Deque, Dict, List
+from dataclasses import dataclass
+from itertools import islice
+from typing import Deque, Dict, List, Tuple
+
+from .locks import StripedLocks
 
 logger = logging.getLogger(__name__)
 
 _MAX_HISTORY_MESSAGES = 12
 _MAX_CONTEXT_CHARS = 20_000
+_CONTEXT_SNIPPET_CHARS = 2_000
 _MAX_MESSAGE_CHARS = 4_000
 
-_context_store: Dict[str, str] = {}
-_history_store: Dict[str, Deque[dict]] = {}
-_lock = Lock()
+
+@dataclass(slots=True)
+class _Message:
+    role: str
+    content: str
+
+
+_context_store: Dict[str, Tuple[str, str]] = {}  # session -> (full text, prompt snippet)
+_history_store: Dict[str, Deque[_Message]] = {}
+_locks = StripedLocks()
 
 
 def _normalize_text(text: str, limit: int | None = None) -> str:
@@ -32,19 +43,32 @@ def set_context(session_id: str, text: str) -> None:
         raise ValueError("Session ID is required to store context.")
 
     cleaned = _normalize_text(text, _MAX_CONTEXT_CHARS)
-    with _lock:
-        _context_store[session_id] = cleaned
+    snippet = cleaned[:_CONTEXT_SNIPPET_CHARS]
+    with _locks.for_key(session_id):
+        _context_store[session_id] = (cleaned, snippet)
     logger.info("Updated context for session %s (chars=%s)", session_id, len(cleaned))
 
 
 def get_context(session_id: str) -> str | None:
     """Retrieve the stored context for the session, if any."""
 
-    if not session_id:
+    if not session_id or session_id not in _context_store:
+        return None
+
+    with _locks.for_key(session_id):
+        stored = _context_store.get(session_id)
+    return stored[0] if stored else None
+
+
+def get_context_snippet(session_id: str) -> str | None:
+    """Retrieve the pre-truncated context snippet used for chat prompts, if any."""
+
+    if not session_id or session_id not in _context_store:
         return None
 
-    with _lock:
-        return _context_store.get(session_id)
+    with _locks.for_key(session_id):
+        stored = _context_store.get(session_id)
+    return stored[1] if stored else None
 
 
 def _append_message(session_id: str, role: str, content: str) -> None:
@@ -59,9 +83,12 @@ def _append_message(session_id: str, role: str, content: str) -> None:
         logger.debug("Ignoring empty %s message for session %s", role, session_id)
         return
 
-    with _lock:
-        history = _history_store.setdefault(session_id, deque(maxlen=_MAX_HISTORY_MESSAGES))
-        history.append({"role": role, "content": cleaned})
+    with _locks.for_key(session_id):
+        try:
+            history = _history_store[session_id]
+        except KeyError:
+            history = _history_store[session_id] = deque(maxlen=_MAX_HISTORY_MESSAGES)
+        history.append(_Message(role=role, content=cleaned))
     logger.info("Stored %s message for session %s", role, session_id)
 
 
@@ -77,15 +104,26 @@ def append_assistant(session_id: str, content: str) -> None:
     _append_message(session_id, "assistant", content)
 
 
+def history_length(session_id: str) -> int:
+    """Return how many chat messages are stored for the session."""
+
+    if not session_id:
+        return 0
+
+    with _locks.for_key(session_id):
+        return len(_history_store.get(session_id, ()))
+
+
 def get_history(session_id: str, max_msgs: int = _MAX_HISTORY_MESSAGES) -> List[dict]:
     """Return the most recent chat messages for the session."""
 
-    if not session_id:
+    if not session_id or session_id not in _history_store:
         return []
 
-    with _lock:
-        history = list(_history_store.get(session_id, ()))
+    with _locks.for_key(session_id):
+        history = _history_store.get(session_id, ())
+        # Copy only the requested tail rather than the whole deque.
+        tail = list(islice(history, max(len(history) - max_msgs, 0), None))
 
-    if max_msgs < len(history):
-        history = history[-max_msgs:]
-    return history
+    # Plain dicts only at the API boundary; storage keeps the slotted messages.
+    return [{"role": message.role, "content": message.content} for message in tail]
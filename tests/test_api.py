@@ -0,0 +1,59 @@
+import io
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+
+client = TestClient(app)
+
+
+def test_csv_upload_with_types_changing_after_first_block():
+    filler = "x" * 3000
+    rows = [f"{i},{filler}" for i in range(30)] + [f"foo,{filler}" for _ in range(30)]
+    data = "\n".join(["id,notes", *rows]).encode()
+
+    response = client.post("/upload", files={"file": ("wide.csv", data, "text/csv")})
+
+    assert response.status_code == 200
+    preview = response.json()["csv_preview"]
+    assert preview["columns"] == ["id", "notes"]
+    assert len(preview["rows"]) == 50
+    assert preview["rows"][0] == ["0", filler]
+    assert preview["rows"][30] == ["foo", filler]
+
+
+def test_workspace_is_privately_cached_and_matches_weak_etags():
+    response = TestClient(app).get("/workspace")
+
+    assert response.headers["cache-control"].startswith("private")
+    assert "chat_session_id" in response.headers["set-cookie"]
+
+    etag = response.headers["etag"]
+    revalidated = client.get("/workspace", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert revalidated.status_code == 304
+
+
+def _docx(body_xml: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body_xml}</w:body></w:document>",
+        )
+    return buffer.getvalue()
+
+
+def test_docx_upload_keeps_tabs_and_breaks():
+    data = _docx(
+        "<w:p><w:pPr><w:tabs><w:tab w:val=\"left\" w:pos=\"720\"/></w:tabs></w:pPr>"
+        "<w:r><w:t>Owner:</w:t><w:tab/><w:t>Alice</w:t><w:br/></w:r>"
+        "<w:r><w:t>Due:</w:t><w:tab/><w:t>Friday</w:t></w:r></w:p>"
+        "<w:p><w:r><w:t>Next</w:t></w:r></w:p>"
+    )
+
+    response = client.post("/upload", files={"file": ("notes.docx", data, "application/octet-stream")})
+
+    assert response.status_code == 200
+    assert response.json()["text_preview"] == "Owner:\tAlice\nDue:\tFriday\nNext"
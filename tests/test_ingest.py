@@ -0,0 +1,22 @@
+from src.pmo_agent import ingest
+from src.pmo_agent.ingest import CSVIngestor
+
+CSV = """id,name,owner,start_date,end_date,status,notes
+1,Kickoff,NA,2024-01-01,,N/A,extra
+null,NaN,,,2024-02-01,null,
+"2","Plan, draft",Alice,,,"",
+"""
+
+
+def test_large_and_small_file_paths_ingest_identically(tmp_path, monkeypatch):
+    path = tmp_path / "plan.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    small = list(CSVIngestor(path).read_tasks())
+    monkeypatch.setattr(ingest, "_ARROW_INGEST_THRESHOLD", 0)
+    large = list(CSVIngestor(path).read_tasks())
+
+    assert large == small
+    assert [task.owner for task in small] == ["NA", None, "Alice"]
+    assert [task.status for task in small] == ["N/A", "null", None]
+    assert (small[1].id, small[1].name) == ("null", "NaN")
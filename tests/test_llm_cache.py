@@ -0,0 +1,139 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.pmo_agent import llm_client
+from src.pmo_agent.llm_cache import SemanticCache
+
+DIM = 8
+
+
+def _unit(*components: float) -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[: len(components)] = components
+    return vector / np.linalg.norm(vector)
+
+
+# Stand-in for a sentence-embedding model: paraphrases share a vector, while an
+# entity swap or a negation lands far enough away to fall below the threshold.
+_EMBEDDINGS = {
+    "What's the status of Alpha?": _unit(1.0, 0.0),
+    "Give me the status on Alpha": _unit(1.0, 0.05),
+    "What's the status of Beta?": _unit(0.6, 0.8),
+    "List all tasks that are overdue": _unit(0.0, 0.0, 1.0),
+    "List all tasks that are not overdue": _unit(0.0, 0.0, 0.3, 0.95),
+}
+
+
+def _cache() -> SemanticCache:
+    return SemanticCache(_EMBEDDINGS.__getitem__, dim=DIM, capacity=4)
+
+
+def test_paraphrase_hits():
+    cache = _cache()
+    cache.store("What's the status of Alpha?", "Alpha is on track.")
+
+    assert cache.lookup("Give me the status on Alpha") == "Alpha is on track."
+
+
+def test_entity_and_negation_changes_miss():
+    cache = _cache()
+    cache.store("What's the status of Alpha?", "Alpha is on track.")
+    cache.store("List all tasks that are overdue", "T-1, T-7")
+
+    assert cache.lookup("What's the status of Beta?") is None
+    assert cache.lookup("List all tasks that are not overdue") is None
+
+
+def test_scope_mismatch_misses():
+    cache = _cache()
+    cache.store("What's the status of Alpha?", "Alpha is on track.", scope="doc-a")
+
+    assert cache.lookup("Give me the status on Alpha", scope="doc-b") is None
+
+
+def test_lru_entry_is_evicted_when_full():
+    cache = SemanticCache(_EMBEDDINGS.__getitem__, dim=DIM, capacity=1)
+    cache.store("What's the status of Alpha?", "Alpha is on track.")
+    cache.store("List all tasks that are overdue", "T-1, T-7")
+
+    assert cache.lookup("What's the status of Alpha?") is None
+    assert cache.lookup("List all tasks that are overdue") == "T-1, T-7"
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    calls = []
+
+    async def generate(prompt: str) -> str:
+        calls.append(prompt)
+        return f"reply {len(calls)}"
+
+    monkeypatch.setattr(llm_client, "_get_model", lambda: None)
+    monkeypatch.setattr(llm_client, "_generate", generate)
+    llm_client.cache_clear()
+    yield calls
+    llm_client.set_semantic_cache(None)
+    llm_client.cache_clear()
+
+
+def test_generate_response_skips_semantic_cache_by_default(fake_gemini):
+    first = asyncio.run(llm_client.generate_response("Is the Alpha project on track for the March release?"))
+    second = asyncio.run(llm_client.generate_response("Is the Beta project on track for the March release?"))
+
+    assert first != second
+    assert len(fake_gemini) == 2
+
+
+def test_generate_response_uses_configured_semantic_cache(fake_gemini):
+    llm_client.set_semantic_cache(_cache())
+
+    first = asyncio.run(llm_client.generate_response("What's the status of Alpha?"))
+    second = asyncio.run(llm_client.generate_response("Give me the status on Alpha"))
+
+    assert first == second
+    assert len(fake_gemini) == 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_int8_scores_match_float_cosine(seed):
+    rng = np.random.default_rng(seed)
+    dim = 384
+    query = rng.standard_normal(dim).astype(np.float32)
+    near = query + 0.3 * rng.standard_normal(dim).astype(np.float32)
+    vectors = {"query": query / np.linalg.norm(query), "near": near / np.linalg.norm(near)}
+    cosine = float(vectors["query"] @ vectors["near"])
+    tolerance = 0.01
+
+    for threshold, expected in ((cosine - tolerance, "hit"), (cosine + tolerance, None)):
+        cache = SemanticCache(vectors.__getitem__, dim=dim, threshold=threshold)
+        cache.store("near", "hit")
+        assert cache.lookup("query") == expected
+
+
+def test_cache_clear_empties_installed_semantic_cache(fake_gemini):
+    cache = _cache()
+    llm_client.set_semantic_cache(cache)
+    asyncio.run(llm_client.generate_response("What's the status of Alpha?"))
+
+    llm_client.cache_clear()
+    asyncio.run(llm_client.generate_response("Give me the status on Alpha"))
+    assert len(fake_gemini) == 2
+
+
+def test_generate_response_embeds_off_the_event_loop(fake_gemini):
+    embedded_on_loop = []
+
+    def embed(text: str) -> np.ndarray:
+        try:
+            asyncio.get_running_loop()
+            embedded_on_loop.append(text)
+        except RuntimeError:
+            pass
+        return _EMBEDDINGS[text]
+
+    llm_client.set_semantic_cache(SemanticCache(embed, dim=DIM))
+    asyncio.run(llm_client.generate_response("What's the status of Alpha?"))
+
+    assert embedded_on_loop == []
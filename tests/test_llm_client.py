@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from src.pmo_agent.llm_client import _TokenBucket
+
+
+def _contended_batch(bucket: _TokenBucket):
+    async def batch() -> float:
+        started = time.monotonic()
+        await asyncio.gather(bucket.acquire(1), bucket.acquire(1))
+        return time.monotonic() - started
+
+    return batch()
+
+
+def test_token_bucket_is_shared_across_event_loops():
+    bucket = _TokenBucket(tokens_per_minute=600)  # 10 tokens per second
+    asyncio.run(bucket.acquire(600))
+
+    # Both runs contend on an empty bucket, each from a fresh event loop.
+    asyncio.run(_contended_batch(bucket))
+    asyncio.run(_contended_batch(bucket))
+
+
+def test_token_bucket_throttles_waiters_in_turn():
+    bucket = _TokenBucket(tokens_per_minute=600)
+    asyncio.run(bucket.acquire(600))
+
+    # The second waiter is booked behind the first: 0.1s, then 0.2s.
+    assert asyncio.run(_contended_batch(bucket)) >= 0.15